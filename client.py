@@ -5,11 +5,38 @@ Connects to quiz server, participates in quizzes, and displays results.
 """
 
 import socket
-import json
-import threading
-import time
+import selectors
 import sys
 import os
+import io
+import stat
+import queue
+import threading
+from collections import deque
+
+try:
+    import msvcrt  # Windows console input; stdin can't be select()ed there
+except ImportError:
+    msvcrt = None
+
+from protocol import (
+    encode_frame, MessageBuffer, JSON_MESSAGE, FRAME_ANSWER, RESULT_CORRECT,
+    RESULT_PAYLOAD, ANSWER_FRAME, set_buffer_sizes, enable_keepalive,
+)
+
+CLEAR_SCREEN = '\x1b[2J\x1b[H'  # ANSI: erase the display and move the cursor home
+
+def enable_ansi_escapes():
+    """Let the Windows console interpret ANSI escape sequences"""
+    if os.name != 'nt':
+        return
+    
+    import ctypes
+    kernel32 = ctypes.windll.kernel32
+    handle = kernel32.GetStdHandle(-11)  # STD_OUTPUT_HANDLE
+    mode = ctypes.c_uint32()
+    if kernel32.GetConsoleMode(handle, ctypes.byref(mode)):
+        kernel32.SetConsoleMode(handle, mode.value | 0x0004)  # ENABLE_VIRTUAL_TERMINAL_PROCESSING
 
 class QuizClient:
     def __init__(self, host='localhost', port=12345):
@@ -19,11 +46,54 @@ class QuizClient:
         self.connected = False
         self.username = ""
         self.quiz_active = False
+        self.topics = []
+        self.current_choices = []
+        self.last_answer = ''
+        
+        # Single event loop over the server socket and the keyboard
+        self.selector = None
+        self.prompt = ''
+        self.input_handler = None  # Called with each line typed at the prompt
+        self.prompts_shown = 0
+        self.stdin_opened = False
+        self.stdin_pending = b''
+        self.stdin_watched = None  # What the selector watches for input
+        self.stdin_closed = False
+        self.typed_lines = deque()  # Lines typed before a prompt asked for them
+        self.console = False  # Windows console, polled with msvcrt
+        self.console_chars = []
+        
+        # Reader thread for stdin that can't be polled; it queues lines and
+        # wakes the selector through a socket pair
+        self.stdin_lines = None
+        self.stdin_wakeup = None
+        self.stdin_notify = None
+        
+        # Single receive buffer, filled in place with recv_into()
+        self.rxbuf = MessageBuffer()
+        
+        # Handlers for JSON messages, keyed by message type
+        self.message_handlers = {
+            'topics': self.handle_topics,
+            'topic_confirmed': self.handle_topic_confirmed,
+            'question': self.handle_question,
+            'result': self.handle_result,
+            'leaderboard': self.handle_leaderboard,
+            'quiz_complete': self.handle_quiz_complete,
+            'error': self.handle_error
+        }
+        
+        # Handlers for binary frames, indexed by frame type
+        self.frame_handlers = (None, self.handle_unexpected_frame, self.handle_result_frame)
         
     def connect_to_server(self):
         """Connect to the quiz server"""
         try:
             self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            # Messages are small and latency-sensitive, so don't let Nagle hold them back
+            self.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            set_buffer_sizes(self.socket)
+            enable_keepalive(self.socket)
             self.socket.connect((self.host, self.port))
             self.connected = True
             print(f"🔗 Connected to quiz server at {self.host}:{self.port}")
@@ -37,9 +107,13 @@ class QuizClient:
         if not self.connect_to_server():
             return
         
-        # Start listening thread
-        listen_thread = threading.Thread(target=self.listen_to_server, daemon=True)
-        listen_thread.start()
+        # Watch the server and the keyboard from one loop instead of a
+        # listener thread plus blocking input() calls
+        self.selector = selectors.DefaultSelector()
+        self.selector.register(self.socket, selectors.EVENT_READ, self.receive_from_server)
+        self.open_stdin()
+        if not self.console:
+            self.watch_stdin()
         
         # Registration process
         self.register_user()
@@ -47,71 +121,249 @@ class QuizClient:
         # Keep the client running
         try:
             while self.connected:
-                time.sleep(1)
+                # On Windows the console is polled between short waits
+                events = self.selector.select(0.05 if self.console else None)
+                for key, _ in events:
+                    key.data()
+                if self.console:
+                    self.poll_console()
         except KeyboardInterrupt:
             print("\n👋 Disconnecting...")
         finally:
             self.disconnect()
     
-    def register_user(self):
-        """Register user with the server"""
-        while True:
-            username = input("👤 Enter your username: ").strip()
-            if username:
-                self.username = username
-                message = {
-                    'type': 'register',
-                    'username': username
-                }
-                self.send_message(message)
-                break
+    def ask(self, prompt, handler):
+        """Show a prompt; the next line typed is passed to handler"""
+        self.prompt = prompt
+        self.input_handler = handler
+        self.prompts_shown += 1
+        sys.stdout.write(prompt)
+        sys.stdout.flush()
+        
+        # Answer from type-ahead (or piped input) first
+        if self.typed_lines:
+            self.handle_input(self.typed_lines.popleft())
+        elif self.stdin_closed:
+            self.end_of_input()
+    
+    def read_line(self, prompt):
+        """Show a prompt and wait for one line; only used before start_client()"""
+        self.open_stdin()
+        sys.stdout.write(prompt)
+        sys.stdout.flush()
+        while not self.typed_lines and not self.stdin_closed:
+            if self.stdin_lines is not None:
+                self.handle_stdin_line(self.stdin_lines.get())
             else:
-                print("❌ Username cannot be empty!")
+                self.read_stdin()
+        return self.typed_lines.popleft() if self.typed_lines else ''
+    
+    def handle_input(self, line):
+        """Pass a typed line to the pending prompt's handler"""
+        handler = self.input_handler
+        if handler is None:
+            # Nothing has been asked yet; keep it for the next prompt
+            self.typed_lines.append(line)
+            return
+        
+        self.input_handler = None
+        if not handler(line.strip()):
+            # Invalid input; ask again
+            self.ask(self.prompt, handler)
     
-    def listen_to_server(self):
-        """Listen for messages from the server"""
-        buffer = ""
-        while self.connected:
+    def open_stdin(self):
+        """Choose how stdin is read; every line then goes the same way"""
+        if self.stdin_opened:
+            return
+        self.stdin_opened = True
+        
+        try:
+            fd = sys.stdin.fileno()
+        except (AttributeError, io.UnsupportedOperation, OSError):
+            # No descriptor (IDLE, embedded consoles), so only input() works
+            self.start_stdin_thread()
+            return
+        
+        if msvcrt is None:
+            return
+        if sys.stdin.isatty():
+            self.console = True
+        elif not stat.S_ISREG(os.fstat(fd).st_mode):
+            # Windows can't select() a pipe and reading one blocks, as in
+            # IDE run consoles and mintty
+            self.start_stdin_thread()
+    
+    def start_stdin_thread(self):
+        """Read stdin with input() on a background thread"""
+        self.stdin_lines = queue.Queue()
+        self.stdin_wakeup, self.stdin_notify = socket.socketpair()
+        threading.Thread(target=self.stdin_reader, daemon=True).start()
+    
+    def stdin_reader(self):
+        """Queue each line typed, then None once stdin is closed"""
+        notify = self.stdin_notify
+        while True:
             try:
-                data = self.socket.recv(1024).decode('utf-8')
-                if not data:
-                    break
-                
-                buffer += data
-                while '\n' in buffer:
-                    line, buffer = buffer.split('\n', 1)
-                    if line.strip():
-                        try:
-                            message = json.loads(line.strip())
-                            self.handle_server_message(message)
-                        except json.JSONDecodeError:
-                            print("❌ Received invalid JSON from server")
-                            
-            except Exception as e:
-                if self.connected:
-                    print(f"❌ Error receiving data: {e}")
-                break
+                line = input()
+            except (EOFError, OSError, RuntimeError):
+                line = None  # RuntimeError: there is no sys.stdin at all
+            self.stdin_lines.put(line)
+            try:
+                notify.send(b'\0')
+            except OSError:
+                return  # Already disconnected
+            if line is None:
+                return
+    
+    def watch_stdin(self):
+        """Handle stdin lines from the event loop as they arrive"""
+        if self.stdin_closed:
+            return
+        
+        if self.stdin_lines is not None:
+            self.selector.register(self.stdin_wakeup, selectors.EVENT_READ, self.read_stdin_lines)
+            self.stdin_watched = self.stdin_wakeup
+            return
+        
+        if msvcrt is None:
+            try:
+                self.selector.register(sys.stdin, selectors.EVENT_READ, self.read_stdin)
+                self.stdin_watched = sys.stdin
+                return
+            except PermissionError:
+                pass  # epoll refuses regular files
         
+        # Regular files can't block, so take all of the input now
+        while not self.stdin_closed:
+            self.read_stdin()
+    
+    def read_stdin(self):
+        """Read whatever has been typed and handle each complete line"""
+        # Every line goes through here (host and port included), so nothing
+        # is left behind in sys.stdin's own buffer
+        data = os.read(sys.stdin.fileno(), 4096)
+        encoding = sys.stdin.encoding or 'utf-8'
+        if not data:
+            # An unterminated last line still counts
+            line, self.stdin_pending = self.stdin_pending, b''
+            self.stdin_eof(line.decode(encoding, 'replace') if line else None)
+            return
+        
+        lines = (self.stdin_pending + data).split(b'\n')
+        self.stdin_pending = lines.pop()
+        for line in lines:
+            self.handle_input(line.decode(encoding, 'replace'))
+    
+    def read_stdin_lines(self):
+        """Handle the lines queued by the stdin reader thread"""
+        self.stdin_wakeup.recv(4096)
+        while not self.stdin_closed:
+            try:
+                line = self.stdin_lines.get_nowait()
+            except queue.Empty:
+                return
+            self.handle_stdin_line(line)
+    
+    def handle_stdin_line(self, line):
+        """Handle a line from the reader thread; None means stdin closed"""
+        if line is None:
+            self.stdin_eof()
+        else:
+            self.handle_input(line)
+    
+    def stdin_eof(self, last_line=None):
+        """Stop reading stdin once it is closed"""
+        self.stdin_closed = True
+        if self.stdin_watched is not None:
+            self.selector.unregister(self.stdin_watched)
+            self.stdin_watched = None
+        
+        if last_line is not None:
+            self.handle_input(last_line)
+        elif self.input_handler is not None:
+            self.end_of_input()
+    
+    def end_of_input(self):
+        """stdin is closed, so the waiting prompt can never be answered"""
+        print("\n👋 Disconnecting...")
         self.connected = False
     
+    def poll_console(self):
+        """Collect keystrokes on Windows and handle each complete line"""
+        while msvcrt.kbhit():
+            char = msvcrt.getwche()
+            if char == '\x03':
+                raise KeyboardInterrupt
+            elif char == '\r':
+                print()
+                line = ''.join(self.console_chars)
+                self.console_chars.clear()
+                self.handle_input(line)
+            elif char == '\b':
+                if self.console_chars:
+                    self.console_chars.pop()
+                    sys.stdout.write(' \b')
+            else:
+                self.console_chars.append(char)
+    
+    def register_user(self):
+        """Register user with the server"""
+        self.ask("👤 Enter your username: ", self.submit_username)
+    
+    def submit_username(self, username):
+        """Send the typed username to the server"""
+        if not username:
+            print("❌ Username cannot be empty!")
+            return False
+        
+        self.username = username
+        message = {
+            'type': 'register',
+            'username': username
+        }
+        self.send_message(message)
+        return True
+    
+    def receive_from_server(self):
+        """Handle data from the server"""
+        try:
+            received = self.socket.recv_into(self.rxbuf.free_space())
+        except Exception as e:
+            if self.connected:
+                print(f"❌ Error receiving data: {e}")
+            self.connected = False
+            return
+        
+        if not received:
+            self.connected = False
+            return
+        
+        # Server output interrupts a pending prompt, which is redrawn after
+        prompts_shown = self.prompts_shown
+        if self.input_handler:
+            print()
+        
+        for frame_type, flags, payload in self.rxbuf.messages(received):
+            if frame_type != JSON_MESSAGE:
+                self.frame_handlers[frame_type](flags, payload)
+            elif payload is None:
+                print("❌ Received invalid JSON from server")
+            else:
+                self.handle_server_message(payload)
+        
+        if self.rxbuf.is_full():
+            print("❌ Received oversized message from server")
+            self.connected = False
+        elif self.input_handler and self.prompts_shown == prompts_shown:
+            self.ask(self.prompt, self.input_handler)
+    
     def handle_server_message(self, message):
         """Handle different types of messages from server"""
         msg_type = message.get('type')
+        handler = self.message_handlers.get(msg_type)
         
-        if msg_type == 'topics':
-            self.handle_topics(message)
-        elif msg_type == 'topic_confirmed':
-            self.handle_topic_confirmed(message)
-        elif msg_type == 'question':
-            self.handle_question(message)
-        elif msg_type == 'result':
-            self.handle_result(message)
-        elif msg_type == 'leaderboard':
-            self.handle_leaderboard(message)
-        elif msg_type == 'quiz_complete':
-            self.handle_quiz_complete(message)
-        elif msg_type == 'error':
-            self.handle_error(message)
+        if handler:
+            handler(message)
         else:
             print(f"❓ Unknown message type: {msg_type}")
     
@@ -124,28 +376,29 @@ class QuizClient:
         for i, topic in enumerate(topics, 1):
             print(f"  {i}. {topic}")
         
-        while True:
-            try:
-                choice = input(f"\n🎯 Select topic (1-{len(topics)}): ").strip()
-                topic_index = int(choice) - 1
-                
-                if 0 <= topic_index < len(topics):
-                    selected_topic = topics[topic_index]
-                    message = {
-                        'type': 'topic',
-                        'topic': selected_topic
-                    }
-                    self.send_message(message)
-                    break
-                else:
-                    print(f"❌ Please enter a number between 1 and {len(topics)}")
-                    
-            except ValueError:
-                print("❌ Please enter a valid number")
-            except KeyboardInterrupt:
-                print("\n👋 Disconnecting...")
-                self.disconnect()
-                return
+        self.topics = topics
+        self.ask(f"\n🎯 Select topic (1-{len(topics)}): ", self.submit_topic)
+    
+    def submit_topic(self, choice):
+        """Send the typed topic choice to the server"""
+        topics = self.topics
+        try:
+            topic_index = int(choice) - 1
+        except ValueError:
+            print("❌ Please enter a valid number")
+            return False
+        
+        if 0 <= topic_index < len(topics):
+            selected_topic = topics[topic_index]
+            message = {
+                'type': 'topic',
+                'topic': selected_topic
+            }
+            self.send_message(message)
+            return True
+        
+        print(f"❌ Please enter a number between 1 and {len(topics)}")
+        return False
     
     def handle_topic_confirmed(self, message):
         """Handle topic confirmation"""
@@ -171,28 +424,25 @@ class QuizClient:
         for i, choice in enumerate(choices, 1):
             print(f"  {i}. {choice}")
         
-        while True:
-            try:
-                answer_choice = input(f"\n🎯 Your answer (1-{len(choices)}): ").strip()
-                choice_index = int(answer_choice) - 1
-                
-                if 0 <= choice_index < len(choices):
-                    selected_answer = choices[choice_index]
-                    answer_message = {
-                        'type': 'answer',
-                        'answer': selected_answer
-                    }
-                    self.send_message(answer_message)
-                    break
-                else:
-                    print(f"❌ Please enter a number between 1 and {len(choices)}")
-                    
-            except ValueError:
-                print("❌ Please enter a valid number")
-            except KeyboardInterrupt:
-                print("\n👋 Disconnecting...")
-                self.disconnect()
-                return
+        self.current_choices = choices
+        self.ask(f"\n🎯 Your answer (1-{len(choices)}): ", self.submit_answer)
+    
+    def submit_answer(self, answer_choice):
+        """Send the typed answer to the server"""
+        choices = self.current_choices
+        try:
+            choice_index = int(answer_choice) - 1
+        except ValueError:
+            print("❌ Please enter a valid number")
+            return False
+        
+        if 0 <= choice_index < len(choices):
+            self.last_answer = choices[choice_index]
+            self.send_frame(ANSWER_FRAME.pack(FRAME_ANSWER, 0, 1, choice_index))
+            return True
+        
+        print(f"❌ Please enter a number between 1 and {len(choices)}")
+        return False
     
     def handle_result(self, message):
         """Handle answer results"""
@@ -202,6 +452,22 @@ class QuizClient:
         score = message.get('score', 0)
         questions_answered = message.get('questions_answered', 0)
         
+        self.show_result(is_correct, correct_answer, user_answer, score, questions_answered)
+    
+    def handle_result_frame(self, flags, payload):
+        """Handle a binary answer result"""
+        correct_index, score, questions_answered = RESULT_PAYLOAD.unpack(payload)
+        choices = self.current_choices
+        correct_answer = choices[correct_index] if correct_index < len(choices) else ''
+        
+        self.show_result(flags & RESULT_CORRECT, correct_answer, self.last_answer, score, questions_answered)
+    
+    def handle_unexpected_frame(self, flags, payload):
+        """Ignore binary frames that only the client sends"""
+        print("❓ Unexpected frame from server")
+    
+    def show_result(self, is_correct, correct_answer, user_answer, score, questions_answered):
+        """Display the outcome of an answer"""
         print("\n" + "=" * 60)
         if is_correct:
             print("✅ CORRECT! Well done!")
@@ -272,19 +538,34 @@ class QuizClient:
     def send_message(self, message):
         """Send JSON message to server"""
         try:
-            data = json.dumps(message) + '\n'
-            self.socket.send(data.encode('utf-8'))
+            self.socket.sendall(encode_frame(message))
+        except Exception as e:
+            print(f"❌ Error sending message: {e}")
+            self.connected = False
+    
+    def send_frame(self, frame):
+        """Send a pre-packed binary frame to server"""
+        try:
+            self.socket.sendall(frame)
         except Exception as e:
             print(f"❌ Error sending message: {e}")
             self.connected = False
     
     def clear_screen(self):
         """Clear the terminal screen"""
-        os.system('cls' if os.name == 'nt' else 'clear')
+        sys.stdout.write(CLEAR_SCREEN)
+        sys.stdout.flush()
     
     def disconnect(self):
         """Disconnect from server"""
         self.connected = False
+        if self.selector:
+            self.selector.close()
+            self.selector = None
+        if self.stdin_notify:
+            self.stdin_notify.close()
+            self.stdin_wakeup.close()
+            self.stdin_notify = self.stdin_wakeup = None
         if self.socket:
             try:
                 self.socket.close()
@@ -296,22 +577,22 @@ def main():
     """Main function to start the client"""
     print("🎓 Multi-User Flashcard Quiz Client")
     print("=" * 40)
+    enable_ansi_escapes()
     
-    # Get server details
-    host = input("🌐 Server host (default: localhost): ").strip()
-    if not host:
-        host = 'localhost'
+    # Get server details; read through the client, which owns stdin
+    client = QuizClient()
+    host = client.read_line("🌐 Server host (default: localhost): ").strip()
+    if host:
+        client.host = host
     
-    port_input = input("🔌 Server port (default: 12345): ").strip()
+    port_input = client.read_line("🔌 Server port (default: 12345): ").strip()
     try:
-        port = int(port_input) if port_input else 12345
+        if port_input:
+            client.port = int(port_input)
     except ValueError:
-        port = 12345
         print("❌ Invalid port, using default: 12345")
     
-    # Create and start client
-    client = QuizClient(host, port)
-    
+    # Start client
     try:
         client.start_client()
     except KeyboardInterrupt:
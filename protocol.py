@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Quiz Wire Protocol
+Message encoding, binary frame layout and socket settings shared by the
+quiz server and client.
+"""
+
+import json
+import socket
+import struct
+
+# orjson is optional; it works on UTF-8 bytes directly (including slices of
+# the receive buffer) and is much faster
+try:
+    import orjson
+    dumps = orjson.dumps
+    loads = orjson.loads
+    
+    def encode_frame(message):
+        """Serialize a message as a newline-terminated frame in one buffer"""
+        return orjson.dumps(message, option=orjson.OPT_APPEND_NEWLINE)
+except ImportError:
+    def dumps(obj):
+        return json.dumps(obj).encode('utf-8')
+    
+    def loads(data):
+        # json.loads() takes bytes but not memoryview slices
+        return json.loads(bytes(data))
+    
+    def encode_frame(message):
+        """Serialize a message as a newline-terminated frame"""
+        return (json.dumps(message) + '\n').encode('utf-8')
+
+RECV_BUFFER_SIZE = 65536  # Receive buffer per connection; also the maximum message size
+SOCKET_BUFFER_SIZE = 65536  # Kernel send/receive buffer size
+KEEPALIVE_OPTIONS = (  # Probe after 30s idle, every 10s, give up after 3 misses
+    ('TCP_KEEPIDLE', 30),
+    ('TCP_KEEPINTVL', 10),
+    ('TCP_KEEPCNT', 3),
+)
+
+# Binary frames for the answer/result round trip. Their leading type byte can
+# never start a JSON line, so they share the stream with JSON messages.
+FRAME_HEADER = struct.Struct('<BBH')  # type, flags, payload length
+FRAME_ANSWER = 1  # payload: index of the chosen option
+FRAME_RESULT = 2  # flags: RESULT_CORRECT; payload: RESULT_PAYLOAD
+FRAME_TYPES = (FRAME_ANSWER, FRAME_RESULT)
+JSON_MESSAGE = 0  # Type reported by MessageBuffer for JSON lines; never sent
+RESULT_CORRECT = 0x01
+RESULT_PAYLOAD = struct.Struct('<BHH')  # correct option index, score, questions answered
+ANSWER_FRAME = struct.Struct(FRAME_HEADER.format + 'B')  # header + chosen option index
+NO_CHOICE = 0xFF  # Option index used when there is no valid choice
+
+def set_buffer_sizes(sock):
+    """Set fixed kernel buffer sizes; call before connect() or listen()"""
+    # The receive buffer size feeds into the TCP window scale, which is
+    # negotiated during the handshake
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, SOCKET_BUFFER_SIZE)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, SOCKET_BUFFER_SIZE)
+
+def enable_keepalive(sock):
+    """Enable TCP keepalive so dead peers are noticed"""
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+    
+    # Keepalive timing options are not available on every platform
+    for name, value in KEEPALIVE_OPTIONS:
+        option = getattr(socket, name, None)
+        if option is not None:
+            sock.setsockopt(socket.IPPROTO_TCP, option, value)
+
+class MessageBuffer:
+    """Receive buffer that splits the stream into JSON messages and binary frames"""
+    
+    def __init__(self, size=RECV_BUFFER_SIZE):
+        self.data = bytearray(size)
+        self.view = memoryview(self.data)
+        self.pending = 0  # Bytes of an incomplete message held at the front
+        self.scanned = 0  # Leading held bytes already searched for a newline
+    
+    def free_space(self):
+        """Writable tail of the buffer, for recv_into() or get_buffer()"""
+        return self.view[self.pending:]
+    
+    def is_full(self):
+        """True when one incomplete message fills the whole buffer"""
+        return self.pending == len(self.data)
+    
+    def messages(self, nbytes):
+        """Yield (type, flags, payload) for each complete message after nbytes arrive
+        
+        Binary frames yield their payload as a view into the buffer, valid
+        only until the next receive. JSON lines yield (JSON_MESSAGE, 0,
+        message), with message set to None when the line is not valid JSON.
+        """
+        data, view = self.data, self.view
+        scan_from = self.scanned
+        end = self.pending + nbytes
+        start = 0
+        scanned = 0  # Stays 0 unless the loop stops on a partial JSON line
+        try:
+            while start < end:
+                if data[start] in FRAME_TYPES:
+                    # Binary frame: fixed header, then exactly `length` bytes
+                    if end - start < FRAME_HEADER.size:
+                        break
+                    frame_type, flags, length = FRAME_HEADER.unpack_from(data, start)
+                    frame_end = start + FRAME_HEADER.size + length
+                    if frame_end > end:
+                        break
+                    payload = view[start + FRAME_HEADER.size:frame_end]
+                    start = frame_end
+                    yield frame_type, flags, payload
+                    continue
+                
+                newline = data.find(b'\n', max(start, scan_from), end)
+                if newline == -1:
+                    # The held partial line needs no rescan next time
+                    scanned = end - start
+                    break
+                # Parse straight out of the buffer, without copying the line
+                line = view[start:newline]
+                start = newline + 1
+                try:
+                    message = loads(line)
+                except ValueError:
+                    # Blank lines are ignored rather than reported
+                    if not bytes(line).strip():
+                        continue
+                    message = None
+                yield JSON_MESSAGE, 0, message
+        finally:
+            # Move any partial message to the front of the buffer
+            # Stopping early (closed generator) may hold complete messages,
+            # so only a partial line counts as scanned
+            self.pending = end - start
+            self.scanned = scanned
+            if start and self.pending:
+                view[:self.pending] = view[start:end]
@@ -4,27 +4,147 @@ Multi-User Flashcard Quiz Server
 Handles multiple clients, manages quiz sessions, and broadcasts leaderboards.
 """
 
+import asyncio
 import socket
-import threading
+from array import array
 import json
 import random
 import time
 import sys
 from typing import Dict, List, Any
 
+from protocol import (
+    dumps, encode_frame, MessageBuffer, JSON_MESSAGE, FRAME_HEADER, FRAME_RESULT,
+    RESULT_CORRECT, RESULT_PAYLOAD, NO_CHOICE, set_buffer_sizes, enable_keepalive,
+)
+
+NEXT_QUESTION_DELAY = 2.0  # Seconds between a result and the next question
+LEADERBOARD_INTERVAL = 0.2  # Seconds over which leaderboard changes are batched
+
+class ClientConnection(asyncio.BufferedProtocol):
+    """A single client connection; frames incoming messages for the server"""
+    
+    def __init__(self, server):
+        self.server = server
+        self.transport = None
+        self.address = None
+        self.fd = -1  # Socket file descriptor; the client's key on the server
+        self.current_answer = ''
+        self.current_answer_lc = ''  # Lowercased once for case-insensitive checks
+        self.current_choices = ()
+        self.current_choice = NO_CHOICE  # Index of the correct option
+        self.question_pending = False  # A question has been sent but not answered
+        self.next_question = None  # Pending timer that sends the next question
+        self.held = b''  # Output held back to go out with the next write
+        
+        # One receive buffer per connection, filled in place by the event loop
+        self.rxbuf = MessageBuffer()
+    
+    def connection_made(self, transport):
+        """Register the new connection with the server"""
+        self.transport = transport
+        self.address = transport.get_extra_info('peername')
+        
+        # Disable Nagle: accepted sockets don't portably inherit TCP_NODELAY
+        sock = transport.get_extra_info('socket')
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        enable_keepalive(sock)
+        self.fd = sock.fileno()
+        
+        self.server.connect_client(self)
+    
+    def write(self, data, more=False):
+        """Queue data for the client; more=True holds it for the next write"""
+        # Like MSG_MORE: back-to-back messages leave in one segment instead
+        # of one packet each, without re-enabling Nagle's delay
+        if self.held:
+            data = self.held + data
+            self.held = b''
+        if more:
+            self.held = data
+        else:
+            self.transport.write(data)
+    
+    def get_buffer(self, sizehint):
+        """Hand the free tail of the receive buffer to the event loop"""
+        return self.rxbuf.free_space()
+    
+    def buffer_updated(self, nbytes):
+        """Dispatch every complete message that has been received"""
+        for frame_type, flags, payload in self.rxbuf.messages(nbytes):
+            try:
+                if frame_type == JSON_MESSAGE:
+                    if payload is None:
+                        self.server.send_error(self, "Invalid JSON format")
+                    else:
+                        self.server.process_message(self, payload)
+                else:
+                    self.server.frame_handlers[frame_type](self, flags, payload)
+            except Exception as e:
+                print(f"❌ Error handling client {self.address}: {e}")
+                self.transport.close()
+            
+            if self.transport.is_closing():
+                return
+        
+        if self.rxbuf.is_full():
+            self.server.send_error(self, "Message too large")
+            self.transport.close()
+    
+    def connection_lost(self, exc):
+        """Clean up after the client goes away"""
+        self.server.disconnect_client(self)
+
 class QuizServer:
     def __init__(self, host='localhost', port=12345, questions_file='questions.json'):
         self.host = host
         self.port = port
         self.questions_file = questions_file
         
-        # Server state
-        self.clients = {}  # {conn: {'username': str, 'topic': str, 'score': int, 'answered': int}}
+        # Server state (only touched from the event loop thread, so no locking)
+        self.clients = {}  # {fd: ClientConnection}
+        
+        # Client table stored as parallel columns, one row per connection
+        self._rows = {}  # {fd: row}
+        self._row_fds = array('i')
+        self.usernames = []
+        self._usernames = set()  # Registered usernames, for O(1) uniqueness checks
+        self.topics = []
+        self.scores = array('i')
+        self.answered = array('i')
         self.questions_data = {}
+        self._topic_names = []
+        self._topic_questions = {}  # {topic: ((question, payload prefix, correct option index), ...)}
+        
+        # Reusable message dicts for the frequent JSON replies; fields are
+        # filled in, serialized and cleared again on every use
+        self._result_msg = {
+            'type': 'result',
+            'correct': False,
+            'correct_answer': None,
+            'your_answer': None,
+            'score': 0,
+            'questions_answered': 0
+        }
+        self._leaderboard_msg = {'type': 'leaderboard', 'leaderboard': None}
+        self._leaderboard_entries = []  # One dict per leaderboard position
+        
+        # Handlers for JSON messages, keyed by message type
+        self.message_handlers = {
+            'register': self.handle_registration,
+            'topic': self.handle_topic_selection,
+            'answer': self.handle_answer,
+            'ready': self.handle_ready,
+            'restart': self.handle_restart,
+            'disconnect': self.handle_manual_disconnect
+        }
+        
+        # Handlers for binary frames, indexed by frame type
+        self.frame_handlers = (None, self.handle_answer_frame, self.handle_unexpected_frame)
         self.quiz_active = False
         self.max_questions = 5  # Number of questions per quiz
         self.current_round = 0
-        self.lock = threading.Lock()
+        self._leaderboard_timer = None  # Pending broadcast while the leaderboard is dirty
         
         # Load questions
         self.load_questions()
@@ -32,12 +152,26 @@ class QuizServer:
         # Socket setup
         self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.server_socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        # Accepted sockets inherit these buffer sizes from the listening socket
+        set_buffer_sizes(self.server_socket)
     
     def load_questions(self):
         """Load quiz questions from JSON file"""
         try:
             with open(self.questions_file, 'r', encoding='utf-8') as f:
                 self.questions_data = json.load(f)
+            
+            # Immutable per-topic index used when picking questions, with each
+            # question's message pre-serialized up to its question number
+            self._topic_names = list(self.questions_data.keys())
+            self._topic_questions = {
+                topic: tuple(
+                    (question, self._question_prefix(question), self._correct_choice(question))
+                    for question in questions
+                )
+                for topic, questions in self.questions_data.items()
+            }
             print(f"✅ Loaded questions for topics: {list(self.questions_data.keys())}")
         except FileNotFoundError:
             print(f"❌ Error: {self.questions_file} not found!")
@@ -46,127 +180,127 @@ class QuizServer:
             print(f"❌ Error: Invalid JSON in {self.questions_file}")
             sys.exit(1)
     
+    def _question_prefix(self, question_data):
+        """Serialize a question message, leaving the question number open"""
+        message = {
+            'type': 'question',
+            'question': question_data['q'],
+            'choices': question_data['choices'],
+            'total_questions': self.max_questions
+        }
+        # Drop the closing brace so send_question() can append the number
+        return dumps(message)[:-1] + b',"question_number":'
+    
+    def _correct_choice(self, question_data):
+        """Find the index of the option matching the answer"""
+        answer = question_data['a'].lower()
+        for index, choice in enumerate(question_data['choices']):
+            if choice.lower() == answer:
+                return index
+        return NO_CHOICE
+    
     def start_server(self):
         """Start the quiz server"""
         try:
             self.server_socket.bind((self.host, self.port))
             self.server_socket.listen(5)
+            self.server_socket.setblocking(False)
             print(f"🎓 Quiz Server started on {self.host}:{self.port}")
             print("📚 Available topics:", ", ".join(self.questions_data.keys()))
             print("⏳ Waiting for clients to connect...")
             
-            while True:
-                try:
-                    client_socket, address = self.server_socket.accept()
-                    print(f"🔗 New connection from {address}")
-                    
-                    # Start a new thread for each client
-                    client_thread = threading.Thread(
-                        target=self.handle_client,
-                        args=(client_socket, address),
-                        daemon=True
-                    )
-                    client_thread.start()
-                    
-                except Exception as e:
-                    print(f"❌ Error accepting connection: {e}")
-                    
+            asyncio.run(self.serve())
+            
         except Exception as e:
             print(f"❌ Error starting server: {e}")
         finally:
             self.server_socket.close()
     
-    def handle_client(self, client_socket, address):
-        """Handle individual client connection"""
-        try:
-            # Initialize client data
-            with self.lock:
-                self.clients[client_socket] = {
-                    'username': '',
-                    'topic': '',
-                    'score': 0,
-                    'answered': 0,
-                    'address': address
-                }
-            
-            while True:
-                try:
-                    # Receive message from client
-                    data = client_socket.recv(1024).decode('utf-8')
-                    if not data:
-                        break
-                    
-                    message = json.loads(data)
-                    self.process_message(client_socket, message)
-                    
-                except json.JSONDecodeError:
-                    self.send_error(client_socket, "Invalid JSON format")
-                except Exception as e:
-                    print(f"❌ Error handling client {address}: {e}")
-                    break
-                    
-        except Exception as e:
-            print(f"❌ Error with client {address}: {e}")
-        finally:
-            self.disconnect_client(client_socket)
+    async def serve(self):
+        """Accept and serve all clients from a single event loop"""
+        loop = asyncio.get_running_loop()
+        server = await loop.create_server(lambda: ClientConnection(self), sock=self.server_socket)
+        async with server:
+            await server.serve_forever()
+    
+    def connect_client(self, conn):
+        """Initialize state for a newly connected client"""
+        print(f"🔗 New connection from {conn.address}")
+        self.clients[conn.fd] = conn
+        self._rows[conn.fd] = len(self._row_fds)
+        self._row_fds.append(conn.fd)
+        self.usernames.append('')
+        self.topics.append('')
+        self.scores.append(0)
+        self.answered.append(0)
     
-    def process_message(self, client_socket, message):
+    def _remove_row(self, fd):
+        """Drop a client's row by moving the last row into its slot"""
+        row = self._rows.pop(fd)
+        last = len(self._row_fds) - 1
+        if row != last:
+            self._row_fds[row] = moved_fd = self._row_fds[last]
+            self.usernames[row] = self.usernames[last]
+            self.topics[row] = self.topics[last]
+            self.scores[row] = self.scores[last]
+            self.answered[row] = self.answered[last]
+            self._rows[moved_fd] = row
+        
+        self._row_fds.pop()
+        self.usernames.pop()
+        self.topics.pop()
+        self.scores.pop()
+        self.answered.pop()
+    
+    def process_message(self, conn, message):
         """Process different types of messages from clients"""
         msg_type = message.get('type')
+        handler = self.message_handlers.get(msg_type)
         
-        if msg_type == 'register':
-            self.handle_registration(client_socket, message)
-        elif msg_type == 'topic':
-            self.handle_topic_selection(client_socket, message)
-        elif msg_type == 'answer':
-            self.handle_answer(client_socket, message)
-        elif msg_type == 'ready':
-            self.handle_ready(client_socket)
-        elif msg_type == 'restart':
-            self.handle_restart(client_socket)
-        elif msg_type == 'disconnect':
-            self.handle_manual_disconnect(client_socket, message)
+        if handler:
+            handler(conn, message)
         else:
-            self.send_error(client_socket, f"Unknown message type: {msg_type}")
+            self.send_error(conn, f"Unknown message type: {msg_type}")
     
-    def handle_registration(self, client_socket, message):
+    def handle_registration(self, conn, message):
         """Handle client registration"""
         username = message.get('username', '').strip()
         
         if not username:
-            self.send_error(client_socket, "Username cannot be empty")
+            self.send_error(conn, "Username cannot be empty")
             return
         
         # Check if username is already taken
-        with self.lock:
-            for client_data in self.clients.values():
-                if client_data['username'] == username:
-                    self.send_error(client_socket, "Username already taken")
-                    return
-            
-            # Register the user
-            self.clients[client_socket]['username'] = username
+        if username in self._usernames:
+            self.send_error(conn, "Username already taken")
+            return
+        
+        # Register the user, releasing any name it registered before
+        row = self._rows[conn.fd]
+        self._usernames.discard(self.usernames[row])
+        self._usernames.add(username)
+        self.usernames[row] = username
         
         # Send available topics
         response = {
             'type': 'topics',
-            'topics': list(self.questions_data.keys()),
+            'topics': self._topic_names,
             'message': f"Welcome {username}! Please select a topic."
         }
-        self.send_message(client_socket, response)
-        print(f"👤 {username} registered from {self.clients[client_socket]['address']}")
+        self.send_message(conn, response)
+        print(f"👤 {username} registered from {conn.address}")
     
-    def handle_topic_selection(self, client_socket, message):
+    def handle_topic_selection(self, conn, message):
         """Handle topic selection"""
         topic = message.get('topic')
         
         if topic not in self.questions_data:
-            self.send_error(client_socket, f"Invalid topic: {topic}")
+            self.send_error(conn, f"Invalid topic: {topic}")
             return
         
-        with self.lock:
-            self.clients[client_socket]['topic'] = topic
-            username = self.clients[client_socket]['username']
+        row = self._rows[conn.fd]
+        self.topics[row] = topic
+        username = self.usernames[row]
         
         # Send confirmation and start quiz
         response = {
@@ -174,100 +308,151 @@ class QuizServer:
             'topic': topic,
             'message': f"Topic '{topic}' selected! Get ready for {self.max_questions} questions."
         }
-        self.send_message(client_socket, response)
+        self.send_message(conn, response)
         print(f"📖 {username} selected topic: {topic}")
         
         # Send first question
-        self.send_question(client_socket)
+        self.send_question(conn)
     
-    def handle_ready(self, client_socket):
+    def handle_ready(self, conn, message):
         """Handle client ready signal"""
-        self.send_question(client_socket)
+        self.send_question(conn)
     
-    def send_question(self, client_socket):
+    def send_question(self, conn):
         """Send a random question to the client"""
-        with self.lock:
-            client_data = self.clients[client_socket]
-            
-            if client_data['answered'] >= self.max_questions:
-                self.send_quiz_complete(client_socket)
-                return
-            
-            topic = client_data['topic']
-            username = client_data['username']
+        row = self._rows[conn.fd]
+        answered = self.answered[row]
         
-        if topic not in self.questions_data:
-            self.send_error(client_socket, "Topic not selected")
+        if answered >= self.max_questions:
+            self.send_quiz_complete(conn)
             return
         
-        # Get random question
-        questions = self.questions_data[topic]
-        question_data = random.choice(questions)
+        topic = self.topics[row]
+        username = self.usernames[row]
         
-        response = {
-            'type': 'question',
-            'question': question_data['q'],
-            'choices': question_data['choices'],
-            'question_number': client_data['answered'] + 1,
-            'total_questions': self.max_questions
-        }
+        questions = self._topic_questions.get(topic)
+        if not questions:
+            self.send_error(conn, "Topic not selected")
+            return
+        
+        # Get random question
+        question_data, payload_prefix, correct_choice = questions[random.randrange(len(questions))]
+        question_number = answered + 1
         
         # Store correct answer for this client
-        with self.lock:
-            self.clients[client_socket]['current_answer'] = question_data['a']
+        conn.current_answer = question_data['a']
+        conn.current_answer_lc = question_data['a'].lower()
+        conn.current_choices = question_data['choices']
+        conn.current_choice = correct_choice
+        conn.question_pending = True
         
-        self.send_message(client_socket, response)
-        print(f"❓ Sent question {client_data['answered'] + 1} to {username}")
+        conn.write(payload_prefix + b'%d}\n' % question_number)
+        print(f"❓ Sent question {question_number} to {username}")
     
-    def handle_answer(self, client_socket, message):
+    def handle_answer(self, conn, message):
         """Handle client answer"""
         user_answer = message.get('answer', '').strip()
         
-        with self.lock:
-            client_data = self.clients[client_socket]
-            correct_answer = client_data.get('current_answer', '')
-            username = client_data['username']
-            
-            # Check if answer is correct
-            is_correct = user_answer.lower() == correct_answer.lower()
-            
-            if is_correct:
-                client_data['score'] += 1
-            
-            client_data['answered'] += 1
-            
-            # Prepare response
-            response = {
-                'type': 'result',
-                'correct': is_correct,
-                'correct_answer': correct_answer,
-                'your_answer': user_answer,
-                'score': client_data['score'],
-                'questions_answered': client_data['answered']
-            }
+        if not conn.question_pending:
+            self.send_error(conn, "No question to answer")
+            return
         
-        self.send_message(client_socket, response)
+        # Check if answer is correct
+        is_correct = user_answer.lower() == conn.current_answer_lc
+        row = self.record_answer(conn, user_answer, is_correct)
+        answered = self.answered[row]
         
-        status = "✅ Correct!" if is_correct else "❌ Wrong"
-        print(f"{status} {username} answered: {user_answer} (correct: {correct_answer})")
+        # Prepare response
+        response = self._result_msg
+        response['correct'] = is_correct
+        response['correct_answer'] = conn.current_answer
+        response['your_answer'] = user_answer
+        response['score'] = self.scores[row]
+        response['questions_answered'] = answered
+        
+        # When the quiz is over the completion message follows immediately,
+        # so let the result share its write
+        quiz_complete = answered >= self.max_questions
+        self.send_message(conn, response, more=quiz_complete)
+        response['correct_answer'] = response['your_answer'] = None
+        self.advance_quiz(conn, quiz_complete)
+    
+    def handle_answer_frame(self, conn, flags, payload):
+        """Handle a binary answer carrying the chosen option's index"""
+        if len(payload) != 1:
+            self.send_error(conn, "Invalid answer frame")
+            return
+        
+        if not conn.question_pending:
+            self.send_error(conn, "No question to answer")
+            return
+        
+        choice = payload[0]
+        choices = conn.current_choices
+        user_answer = choices[choice] if choice < len(choices) else ''
+        
+        # Check if answer is correct; NO_CHOICE never matches a real option
+        is_correct = choice < len(choices) and choice == conn.current_choice
+        row = self.record_answer(conn, user_answer, is_correct)
+        answered = self.answered[row]
         
+        result = FRAME_HEADER.pack(FRAME_RESULT, RESULT_CORRECT if is_correct else 0, RESULT_PAYLOAD.size)
+        result += RESULT_PAYLOAD.pack(conn.current_choice, self.scores[row], answered)
+        
+        quiz_complete = answered >= self.max_questions
+        conn.write(result, more=quiz_complete)
+        self.advance_quiz(conn, quiz_complete)
+    
+    def handle_unexpected_frame(self, conn, flags, payload):
+        """Reject binary frames that only the server sends"""
+        self.send_error(conn, "Unexpected frame type")
+    
+    def record_answer(self, conn, user_answer, is_correct):
+        """Update the client's score for an answer and return its row"""
+        row = self._rows[conn.fd]
+        conn.question_pending = False
+        
+        if is_correct:
+            self.scores[row] += 1
+        
+        self.answered[row] += 1
+        
+        status = "✅ Correct!" if is_correct else "❌ Wrong"
+        print(f"{status} {self.usernames[row]} answered: {user_answer} (correct: {conn.current_answer})")
+        return row
+    
+    def advance_quiz(self, conn, quiz_complete):
+        """Update the leaderboard and move the client past an answered question"""
         # Send leaderboard
-        self.broadcast_leaderboard()
+        self.schedule_leaderboard()
+        
+        # An earlier answer's timer may still be pending; only one question
+        # should follow this answer
+        if conn.next_question:
+            conn.next_question.cancel()
+            conn.next_question = None
         
         # Check if quiz is complete
-        if client_data['answered'] >= self.max_questions:
-            self.send_quiz_complete(client_socket)
+        if quiz_complete:
+            self.send_quiz_complete(conn)
         else:
-            # Send next question after a short delay
-            threading.Timer(2.0, self.send_question, args=(client_socket,)).start()
+            # Send next question after a short delay; call_later() only adds
+            # an entry to the event loop's timer heap
+            loop = asyncio.get_running_loop()
+            conn.next_question = loop.call_later(NEXT_QUESTION_DELAY, self.send_next_question, conn)
+    
+    def send_next_question(self, conn):
+        """Timer callback that sends the client its next question"""
+        conn.next_question = None
+        if self.clients.get(conn.fd) is conn:
+            self.send_question(conn)
     
-    def send_quiz_complete(self, client_socket):
+    def send_quiz_complete(self, conn):
         """Send quiz completion message with enhanced feedback"""
-        with self.lock:
-            client_data = self.clients[client_socket]
-            username = client_data['username']
-            score = client_data['score']
-            topic = client_data['topic']
+        row = self._rows[conn.fd]
+        username = self.usernames[row]
+        score = self.scores[row]
+        topic = self.topics[row]
         
         percentage = round((score / self.max_questions) * 100, 1)
         
@@ -282,104 +467,130 @@ class QuizServer:
             'can_restart': True
         }
         
-        self.send_message(client_socket, response)
+        self.send_message(conn, response)
         print(f"🏁 {username} completed {topic} quiz with score: {score}/{self.max_questions} ({percentage}%)")
         
         # Send final leaderboard
-        self.broadcast_leaderboard()
+        self.schedule_leaderboard()
         
         # Offer restart option (handled by enhanced client)
     
+    def schedule_leaderboard(self):
+        """Mark the leaderboard dirty; changes are broadcast in batches"""
+        # Answers arriving close together share one broadcast instead of
+        # each sending the whole leaderboard to every client
+        if self._leaderboard_timer is None:
+            loop = asyncio.get_running_loop()
+            self._leaderboard_timer = loop.call_later(LEADERBOARD_INTERVAL, self.flush_leaderboard)
+    
+    def flush_leaderboard(self):
+        """Timer callback that broadcasts the batched leaderboard changes"""
+        self._leaderboard_timer = None
+        self.broadcast_leaderboard()
+    
     def broadcast_leaderboard(self):
         """Broadcast current leaderboard to all clients"""
-        with self.lock:
-            # Create leaderboard data
-            leaderboard = []
-            for client_data in self.clients.values():
-                if client_data['username']:  # Only include registered users
-                    leaderboard.append({
-                        'username': client_data['username'],
-                        'score': client_data['score'],
-                        'answered': client_data['answered'],
-                        'topic': client_data['topic']
-                    })
-            
-            # Sort by score, then by questions answered
-            leaderboard.sort(key=lambda x: (x['score'], x['answered']), reverse=True)
+        usernames, topics, scores, answered = self.usernames, self.topics, self.scores, self.answered
+        
+        # Sort registered users by score, then by questions answered
+        rows = [row for row in range(len(usernames)) if usernames[row]]
+        rows.sort(key=lambda row: (scores[row], answered[row]), reverse=True)
+        
+        # Create leaderboard data, refilling the pooled entry dicts
+        entries = self._leaderboard_entries
+        while len(entries) < len(rows):
+            entries.append({'username': '', 'score': 0, 'answered': 0, 'topic': ''})
+        for entry, row in zip(entries, rows):
+            entry['username'] = usernames[row]
+            entry['score'] = scores[row]
+            entry['answered'] = answered[row]
+            entry['topic'] = topics[row]
         
         # Prepare leaderboard message
-        leaderboard_msg = {
-            'type': 'leaderboard',
-            'leaderboard': leaderboard
-        }
+        leaderboard_msg = self._leaderboard_msg
+        leaderboard_msg['leaderboard'] = entries[:len(rows)]
+        
+        # Serialize once; every client receives identical bytes
+        payload = encode_frame(leaderboard_msg)
+        leaderboard_msg['leaderboard'] = None
         
-        # Send to all clients
-        for client_socket in list(self.clients.keys()):
+        # Send to all clients. Writes never disconnect a client synchronously
+        # (the event loop reports lost connections later), so no snapshot
+        # of the dict is needed
+        for conn in self.clients.values():
             try:
-                self.send_message(client_socket, leaderboard_msg)
+                conn.write(payload)
             except:
                 # Client might be disconnected
                 pass
     
-    def send_message(self, client_socket, message):
+    def send_message(self, conn, message, more=False):
         """Send JSON message to client"""
         try:
-            data = json.dumps(message) + '\n'
-            client_socket.send(data.encode('utf-8'))
+            conn.write(encode_frame(message), more)
         except Exception as e:
             print(f"❌ Error sending message: {e}")
     
-    def send_error(self, client_socket, error_message):
+    def send_error(self, conn, error_message):
         """Send error message to client"""
         response = {
             'type': 'error',
             'message': error_message
         }
-        self.send_message(client_socket, response)
+        self.send_message(conn, response)
     
-    def disconnect_client(self, client_socket):
+    def disconnect_client(self, conn):
         """Handle client disconnection"""
         try:
-            with self.lock:
-                if client_socket in self.clients:
-                    username = self.clients[client_socket].get('username', 'Unknown')
-                    address = self.clients[client_socket].get('address', 'Unknown')
-                    del self.clients[client_socket]
-                    print(f"👋 {username} disconnected from {address}")
+            if self.clients.get(conn.fd) is not conn:
+                return
             
-            client_socket.close()
+            username = self.usernames[self._rows[conn.fd]]
+            self._usernames.discard(username)
+            username = username or 'Unknown'
+            del self.clients[conn.fd]
+            self._remove_row(conn.fd)
+            print(f"👋 {username} disconnected from {conn.address}")
+            
+            if conn.next_question:
+                conn.next_question.cancel()
+            conn.transport.close()
             
             # Broadcast updated leaderboard
-            self.broadcast_leaderboard()
+            self.schedule_leaderboard()
             
         except Exception as e:
             print(f"❌ Error disconnecting client: {e}")
     
-    def handle_restart(self, client_socket):
+    def handle_restart(self, conn, message):
         """Handle client restart request"""
-        with self.lock:
-            if client_socket in self.clients:
-                # Reset client state for new quiz
-                self.clients[client_socket]['score'] = 0
-                self.clients[client_socket]['answered'] = 0
-                self.clients[client_socket]['topic'] = ''
-                username = self.clients[client_socket]['username']
-                
-                print(f"🔄 {username} requested to restart quiz")
-                
-                # Send available topics again
-                response = {
-                    'type': 'topics',
-                    'topics': list(self.questions_data.keys()),
-                    'message': f"Welcome back {username}! Ready for another challenge?"
-                }
-                self.send_message(client_socket, response)
-    
-    def handle_manual_disconnect(self, client_socket, message):
+        if self.clients.get(conn.fd) is conn:
+            # Reset client state for new quiz
+            if conn.next_question:
+                conn.next_question.cancel()
+                conn.next_question = None
+            conn.question_pending = False
+            row = self._rows[conn.fd]
+            self.scores[row] = 0
+            self.answered[row] = 0
+            self.topics[row] = ''
+            username = self.usernames[row]
+            
+            print(f"🔄 {username} requested to restart quiz")
+            
+            # Send available topics again
+            response = {
+                'type': 'topics',
+                'topics': self._topic_names,
+                'message': f"Welcome back {username}! Ready for another challenge?"
+            }
+            self.send_message(conn, response)
+    
+    def handle_manual_disconnect(self, conn, message):
         """Handle manual disconnect message from client"""
         username = message.get('username', 'Unknown')
         print(f"👋 {username} manually disconnected")
-        self.disconnect_client(client_socket)
+        self.disconnect_client(conn)
 
 def main():
     """Main function to start the server"""